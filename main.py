@@ -1,12 +1,19 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+import pyarrow as pa
+import pyarrow.parquet as pq
+
 from pathlib import Path
 import unicodedata
+import tempfile
+import json
 import io
+import os
 
 # =========================
 # 기본 설정
@@ -36,37 +43,76 @@ PLOTLY_FONT = dict(family="Malgun Gothic, Apple SD Gothic Neo, sans-serif")
 def normalize_name(name):
     return unicodedata.normalize("NFC", name)
 
-def find_file_by_normalized_name(directory: Path, target_name: str):
-    target_n = normalize_name(target_name)
-    for p in directory.iterdir():
-        if normalize_name(p.name) == target_n:
-            return p
-    return None
+def index_by_normalized_name(directory: Path):
+    return {normalize_name(p.name): p for p in directory.iterdir()}
 
 # =========================
 # 데이터 로딩
 # =========================
 DATA_DIR = Path("data")
+SCHOOLS = ["송도고", "하늘고", "아라고", "동산고"]
+
+ENV_DTYPES = {
+    "time": str,
+    "temperature": np.float32,
+    "humidity": np.float32,
+    "ph": np.float32,
+    "ec": np.float32
+}
 
 @st.cache_data
 def load_environment_data():
     with st.spinner("환경 데이터 로딩 중..."):
         result = {}
-        for csv_name in [
-            "송도고_환경데이터.csv",
-            "하늘고_환경데이터.csv",
-            "아라고_환경데이터.csv",
-            "동산고_환경데이터.csv"
-        ]:
-            file_path = find_file_by_normalized_name(DATA_DIR, csv_name)
+        by_name = index_by_normalized_name(DATA_DIR)
+        for i, school in enumerate(SCHOOLS):
+            csv_name = f"{school}_환경데이터.csv"
+            file_path = by_name.get(normalize_name(csv_name))
             if file_path is None:
                 st.error(f"파일을 찾을 수 없습니다: {csv_name}")
                 return None
-            df = pd.read_csv(file_path)
-            df["school"] = csv_name.split("_")[0]
-            result[df["school"].iloc[0]] = df
+            df = pd.read_csv(file_path, dtype=ENV_DTYPES)
+            # 학교명은 int8 코드의 범주형으로 두어 groupby 시 문자열 해싱을 피한다
+            df["school"] = pd.Categorical.from_codes(
+                np.full(len(df), i, dtype=np.int8), categories=SCHOOLS
+            )
+            result[school] = df
         return result
 
+# 시트별 컬럼 목록/dtype을 Parquet 메타데이터에 함께 저장해, 합쳐 쓴 표를 시트별 원래 모양으로 복원한다
+# (행이 없는 시트도 유지되고, 다른 시트 때문에 생긴 NaN 컬럼이나 float 승격도 되돌린다)
+SHEETS_META_KEY = b"sheets"
+
+def read_growth_parquet(parquet_path: Path):
+    table = pq.read_table(parquet_path)
+    sheets = json.loads(table.schema.metadata[SHEETS_META_KEY])
+    combined = table.to_pandas()
+    data = {}
+    for sheet in sheets:
+        part = combined.loc[combined["학교"] == sheet["name"], sheet["columns"]]
+        data[sheet["name"]] = part.astype(dict(zip(sheet["columns"], sheet["dtypes"]))).reset_index(drop=True)
+    return data
+
+def write_growth_parquet(data, parquet_path: Path):
+    table = pa.Table.from_pandas(pd.concat(data.values(), ignore_index=True), preserve_index=False)
+    sheets = [
+        {"name": sheet, "columns": list(df.columns), "dtypes": [str(t) for t in df.dtypes]}
+        for sheet, df in data.items()
+    ]
+    metadata = dict(table.schema.metadata or {})
+    metadata[SHEETS_META_KEY] = json.dumps(sheets, ensure_ascii=False).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # 임시 파일에 다 쓴 뒤 교체해, 다른 프로세스가 반쯤 쓰인 파일을 읽지 않게 한다
+    fd, tmp_name = tempfile.mkstemp(dir=parquet_path.parent, suffix=".parquet.tmp")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_name)
+        os.replace(tmp_name, parquet_path)
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
 @st.cache_data
 def load_growth_data():
     with st.spinner("생육 결과 데이터 로딩 중..."):
@@ -80,12 +126,26 @@ def load_growth_data():
             st.error("생육 결과 XLSX 파일을 찾을 수 없습니다.")
             return None
 
+        # XLSX를 한 번 읽은 뒤 Parquet 사본을 만들어 두고, 이후에는 사본을 읽는다
+        # (사본은 캐시일 뿐이므로 읽기/쓰기에 실패하면 XLSX 경로로 넘어간다)
+        parquet_path = xlsx_path.with_suffix(".parquet")
+        if parquet_path.exists() and parquet_path.stat().st_mtime >= xlsx_path.stat().st_mtime:
+            try:
+                return read_growth_parquet(parquet_path), xlsx_path.name
+            except (OSError, ValueError, TypeError, KeyError):
+                pass
+
         xls = pd.ExcelFile(xlsx_path)
         data = {}
         for sheet in xls.sheet_names:
             df = pd.read_excel(xls, sheet_name=sheet)
             df["학교"] = sheet
             data[sheet] = df
+
+        try:
+            write_growth_parquet(data, parquet_path)
+        except (OSError, ValueError, TypeError):
+            pass
         return data, xlsx_path.name
 
 env_data = load_environment_data()
@@ -96,6 +156,228 @@ if env_data is None or growth_data_tuple is None:
 
 growth_data, growth_filename = growth_data_tuple
 
+# Streamlit은 매 rerun마다 스크립트 전체를 다시 실행하므로 상수 테이블은 캐시된 팩토리에서 받는다
+@st.cache_resource
+def ec_constants():
+    ec_table = pd.DataFrame({
+        "학교명": SCHOOLS,
+        "EC 목표": [4.0, 2.0, 8.0, 6.0],
+        "개체수": [29, 45, 106, 58],
+        "색상": ["Blue", "Green", "Red", "Purple"]
+    })
+    ec_map = dict(zip(ec_table["학교명"], ec_table["EC 목표"]))
+    ec_targets = pd.Series(ec_map, dtype=np.float32)
+    return ec_table, ec_map, ec_targets, ec_table["개체수"].sum()
+
+EC_TABLE, EC_MAP, EC_TARGETS, TOTAL_PLANTS = ec_constants()
+
+# 원본 dict는 위 로더에서 이미 캐시되므로 해싱 없이(_ 접두사) 넘긴다
+@st.cache_data
+def get_env_all(_env_data):
+    return pd.concat(_env_data.values(), ignore_index=True)
+
+@st.cache_data
+def get_growth_all(_growth_data):
+    growth_all = pd.concat(_growth_data.values(), ignore_index=True)
+    cats = pd.Categorical(growth_all["학교"], categories=list(EC_MAP))
+    ec_arr = np.array(list(EC_MAP.values()), dtype=np.float32)
+    codes = cats.codes
+    growth_all["EC"] = np.where(codes >= 0, ec_arr[codes], np.nan).astype(np.float32)
+    return growth_all
+
+# 전체 평균은 학교별 부분합/개수를 누적해 구한다 (concat 없이)
+@st.cache_data
+def overall_env_means(_env_data, cols):
+    totals = np.zeros(len(cols))
+    counts = np.zeros(len(cols))
+    for d in _env_data.values():
+        values = d[cols].to_numpy(dtype=np.float64)
+        totals += np.nansum(values, axis=0)
+        counts += np.count_nonzero(~np.isnan(values), axis=0)
+    return dict(zip(cols, totals / counts))
+
+# env_all은 get_env_all 캐시에서 오므로 해싱하지 않는다 (해싱이 groupby보다 비싸다)
+@st.cache_data
+def school_env_means(_env_all):
+    return _env_all.groupby("school", observed=True).mean(numeric_only=True).reset_index()
+
+# EC 코드별 합계/개수를 한 번의 bincount로 구한다 (정렬·take 없는 단일 패스)
+@st.cache_data
+def ec_means(growth_all):
+    codes, ec_values = pd.factorize(growth_all["EC"], sort=True)
+    valid = codes >= 0
+    codes = codes[valid]
+    k = len(ec_values)
+    index = pd.Index(ec_values, name="EC")
+
+    def group_mean(col):
+        w = growth_all[col].to_numpy(dtype=np.float64)[valid]
+        ok = ~np.isnan(w)
+        sums = np.bincount(codes[ok], weights=w[ok], minlength=k)
+        n = np.bincount(codes[ok], minlength=k)
+        with np.errstate(invalid="ignore"):
+            return pd.Series(sums / n, index=index, name=col)
+
+    return (
+        group_mean("생중량(g)"),
+        group_mean("잎 수(장)"),
+        group_mean("지상부 길이(mm)"),
+        pd.Series(np.bincount(codes, minlength=k), index=index)
+    )
+
+# 상자그림용 학교별 사분위수/수염 위치 (1.5 IQR 안쪽의 실제 최소·최대값)
+# 사분위수는 Plotly.js 기본값(quartilemethod="linear", n·p − 0.5 규칙)과 같은 hazen 방식으로 구한다
+def hazen_quantile(p):
+    return lambda v: np.quantile(v.dropna(), p, method="hazen")
+
+@st.cache_data
+def weight_box_stats(growth_all):
+    weight = growth_all["생중량(g)"]
+    stats = growth_all.groupby("학교", sort=False)["생중량(g)"].agg(
+        q1=hazen_quantile(.25),
+        median=hazen_quantile(.5),
+        q3=hazen_quantile(.75),
+        mean="mean"
+    )
+    iqr = stats["q3"] - stats["q1"]
+    lo = (stats["q1"] - 1.5 * iqr).reindex(growth_all["학교"]).to_numpy()
+    hi = (stats["q3"] + 1.5 * iqr).reindex(growth_all["학교"]).to_numpy()
+    inside = growth_all[(weight >= lo) & (weight <= hi)].groupby("학교")["생중량(g)"]
+    stats["lowerfence"] = inside.min()
+    stats["upperfence"] = inside.max()
+    return stats
+
+@st.cache_data
+def to_csv_bytes(df):
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+@st.cache_data
+def to_xlsx_bytes(df):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine="xlsxwriter")
+    return buffer.getvalue()
+
+env_all = get_env_all(env_data)
+growth_all = get_growth_all(growth_data)
+weight_mean, leaf_mean, length_mean, ec_counts = ec_means(growth_all)
+
+# =========================
+# 차트 생성 (입력이 같으면 캐시된 Figure 객체를 그대로 재사용)
+# st.plotly_chart는 Figure를 직렬화만 하고 변경하지 않으므로 cache_resource로 공유한다
+# =========================
+@st.cache_resource
+def build_env_bars(avg_env):
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=["평균 온도", "평균 습도", "평균 pH", "목표 EC vs 실측 EC"]
+    )
+
+    school_x = avg_env["school"].astype(str).to_numpy()
+    target_ec = EC_TARGETS.reindex(avg_env["school"]).to_numpy()
+    fig.add_traces(
+        [
+            go.Bar(x=school_x, y=avg_env["temperature"]),
+            go.Bar(x=school_x, y=avg_env["humidity"]),
+            go.Bar(x=school_x, y=avg_env["ph"]),
+            go.Bar(x=school_x, y=target_ec, name="목표 EC"),
+            go.Bar(x=school_x, y=avg_env["ec"], name="실측 EC")
+        ],
+        rows=[1, 1, 2, 2, 2],
+        cols=[1, 2, 1, 2, 2]
+    )
+
+    fig.update_layout(font=PLOTLY_FONT, height=700)
+    return fig
+
+# 원본 DataFrame은 로더 캐시에서 오므로 해싱하지 않고(_ 접두사) 학교명/컬럼명을 키로 쓴다
+@st.cache_resource
+def build_time_series(school, _df, target_ec):
+    t = _df["time"].to_numpy()
+    temp = _df["temperature"].to_numpy(dtype=np.float32)
+    hum = _df["humidity"].to_numpy(dtype=np.float32)
+    ec = _df["ec"].to_numpy(dtype=np.float32)
+
+    fig_ts = go.Figure()
+    fig_ts.add_scatter(x=t, y=temp, name="온도")
+    fig_ts.add_scatter(x=t, y=hum, name="습도")
+    fig_ts.add_scatter(x=t, y=ec, name="EC")
+    fig_ts.add_hline(y=target_ec, line_dash="dash")
+
+    fig_ts.update_layout(font=PLOTLY_FONT, hovermode="x unified")
+    return fig_ts
+
+@st.cache_resource
+def build_ec_bar(ec_avg):
+    ec_x = ec_avg["EC"].to_numpy(dtype=np.float32)
+    weight = ec_avg["생중량(g)"].to_numpy(dtype=np.float32)
+    fig_ec = go.Figure(go.Bar(
+        x=ec_x,
+        y=weight,
+        text=weight,
+        hovertemplate="EC=%{x}<br>생중량(g)=%{y}<extra></extra>"
+    ))
+    fig_ec.update_layout(font=PLOTLY_FONT, xaxis_title="EC", yaxis_title="생중량(g)")
+    return fig_ec
+
+@st.cache_resource
+def build_ec_grid(ec_avg, leaf_mean, length_mean, ec_counts):
+    fig2 = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=["생중량", "잎 수", "지상부 길이", "개체수"]
+    )
+
+    ec_x = ec_avg["EC"].to_numpy(dtype=np.float32)
+    fig2.add_traces(
+        [
+            go.Bar(x=ec_x, y=ec_avg["생중량(g)"].to_numpy(dtype=np.float32)),
+            go.Bar(x=ec_x, y=leaf_mean.to_numpy(dtype=np.float32)),
+            go.Bar(x=ec_x, y=length_mean.to_numpy(dtype=np.float32)),
+            go.Bar(x=ec_x, y=ec_counts.to_numpy(dtype=np.int32))
+        ],
+        rows=[1, 1, 2, 2],
+        cols=[1, 2, 1, 2]
+    )
+
+    fig2.update_layout(font=PLOTLY_FONT, height=700)
+    return fig2
+
+@st.cache_resource
+def build_weight_box(box_stats):
+    fig_box = go.Figure([
+        go.Box(
+            name=school,
+            x=[school],
+            q1=[row["q1"]],
+            median=[row["median"]],
+            q3=[row["q3"]],
+            lowerfence=[row["lowerfence"]],
+            upperfence=[row["upperfence"]],
+            mean=[row["mean"]],
+            boxmean=True,
+            boxpoints=False
+        )
+        for school, row in box_stats.iterrows()
+    ])
+    fig_box.update_layout(
+        font=PLOTLY_FONT, hovermode="closest",
+        xaxis_title="학교", yaxis_title="생중량(g)", legend_title_text="학교"
+    )
+    return fig_box
+
+@st.cache_resource
+def build_scatter(_growth_all, x):
+    fig_sc = px.scatter(
+        _growth_all,
+        x=x,
+        y="생중량(g)",
+        trendline="ols",
+        render_mode="webgl"
+    )
+    fig_sc.update_layout(font=PLOTLY_FONT, hovermode="closest")
+    return fig_sc
+
 # =========================
 # 사이드바
 # =========================
@@ -112,7 +394,7 @@ tab1, tab2, tab3 = st.tabs(["📖 실험 개요", "🌡️ 환경 데이터", "
 # =========================
 # Tab 1 : 실험 개요
 # =========================
-with tab1:
+def render_overview():
     st.subheader("연구 배경 및 목적")
     st.markdown("""
     극지식물은 제한된 환경 조건에서 생존하기 때문에  
@@ -121,29 +403,16 @@ with tab1:
     **최적 EC 농도**를 도출하는 것을 목적으로 한다.
     """)
 
-    ec_table = pd.DataFrame({
-        "학교명": ["송도고", "하늘고", "아라고", "동산고"],
-        "EC 목표": [4.0, 2.0, 8.0, 6.0],
-        "개체수": [29, 45, 106, 58],
-        "색상": ["Blue", "Green", "Red", "Purple"]
-    })
-    st.table(ec_table)
-
-    total_plants = sum(ec_table["개체수"])
-    avg_temp = pd.concat(env_data.values())["temperature"].mean()
-    avg_hum = pd.concat(env_data.values())["humidity"].mean()
-
-    growth_all = pd.concat(growth_data.values())
-    ec_map = {"송도고": 4.0, "하늘고": 2.0, "아라고": 8.0, "동산고": 6.0}
-    growth_all["EC"] = growth_all["학교"].map(ec_map)
-    optimal_ec = (
-        growth_all.groupby("EC")["생중량(g)"]
-        .mean()
-        .idxmax()
-    )
+    st.table(EC_TABLE)
+
+    env_means = overall_env_means(env_data, ["temperature", "humidity"])
+    avg_temp = env_means["temperature"]
+    avg_hum = env_means["humidity"]
+
+    optimal_ec = weight_mean.idxmax()
 
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric("총 개체수", f"{total_plants} 개")
+    c1.metric("총 개체수", f"{TOTAL_PLANTS} 개")
     c2.metric("평균 온도", f"{avg_temp:.1f} ℃")
     c3.metric("평균 습도", f"{avg_hum:.1f} %")
     c4.metric("최적 EC", f"{optimal_ec}")
@@ -151,50 +420,26 @@ with tab1:
 # =========================
 # Tab 2 : 환경 데이터
 # =========================
-with tab2:
+def render_environment(selected_school):
     st.subheader("학교별 환경 평균 비교")
 
-    env_all = pd.concat(env_data.values())
-
-    avg_env = env_all.groupby("school").mean(numeric_only=True).reset_index()
-
-    fig = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=["평균 온도", "평균 습도", "평균 pH", "목표 EC vs 실측 EC"]
-    )
-
-    fig.add_bar(x=avg_env["school"], y=avg_env["temperature"], row=1, col=1)
-    fig.add_bar(x=avg_env["school"], y=avg_env["humidity"], row=1, col=2)
-    fig.add_bar(x=avg_env["school"], y=avg_env["ph"], row=2, col=1)
-
-    target_ec = avg_env["school"].map(ec_map)
-    fig.add_bar(x=avg_env["school"], y=target_ec, name="목표 EC", row=2, col=2)
-    fig.add_bar(x=avg_env["school"], y=avg_env["ec"], name="실측 EC", row=2, col=2)
+    avg_env = school_env_means(env_all)
 
-    fig.update_layout(font=PLOTLY_FONT, height=700)
+    fig = build_env_bars(avg_env)
     st.plotly_chart(fig, use_container_width=True)
 
     if selected_school != "전체":
         df = env_data[selected_school]
         st.subheader(f"{selected_school} 시계열 데이터")
 
-        fig_ts = go.Figure()
-        fig_ts.add_scatter(x=df["time"], y=df["temperature"], name="온도")
-        fig_ts.add_scatter(x=df["time"], y=df["humidity"], name="습도")
-        fig_ts.add_scatter(x=df["time"], y=df["ec"], name="EC")
-        fig_ts.add_hline(y=ec_map[selected_school], line_dash="dash")
-
-        fig_ts.update_layout(font=PLOTLY_FONT)
+        fig_ts = build_time_series(selected_school, df, EC_MAP[selected_school])
         st.plotly_chart(fig_ts, use_container_width=True)
 
     with st.expander("환경 데이터 원본 보기 / 다운로드"):
         st.dataframe(env_all)
-        buffer = io.BytesIO()
-        env_all.to_csv(buffer, index=False)
-        buffer.seek(0)
         st.download_button(
             "CSV 다운로드",
-            data=buffer,
+            data=to_csv_bytes(env_all),
             file_name="환경데이터_전체.csv",
             mime="text/csv"
         )
@@ -202,87 +447,47 @@ with tab2:
 # =========================
 # Tab 3 : 생육 결과
 # =========================
-with tab3:
+def render_growth():
     st.subheader("🥇 EC별 평균 생중량")
 
-    ec_avg = growth_all.groupby("EC")["생중량(g)"].mean().reset_index()
+    ec_avg = weight_mean.reset_index()
 
-    fig_ec = px.bar(
-        ec_avg,
-        x="EC",
-        y="생중량(g)",
-        text="생중량(g)"
-    )
-    fig_ec.update_layout(font=PLOTLY_FONT)
+    fig_ec = build_ec_bar(ec_avg)
     st.plotly_chart(fig_ec, use_container_width=True)
 
     st.subheader("EC별 생육 지표 비교")
 
-    fig2 = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=["생중량", "잎 수", "지상부 길이", "개체수"]
-    )
-
-    fig2.add_bar(x=ec_avg["EC"], y=ec_avg["생중량(g)"], row=1, col=1)
-    fig2.add_bar(
-        x=growth_all.groupby("EC")["잎 수(장)"].mean().index,
-        y=growth_all.groupby("EC")["잎 수(장)"].mean(),
-        row=1, col=2
-    )
-    fig2.add_bar(
-        x=growth_all.groupby("EC")["지상부 길이(mm)"].mean().index,
-        y=growth_all.groupby("EC")["지상부 길이(mm)"].mean(),
-        row=2, col=1
-    )
-    fig2.add_bar(
-        x=growth_all.groupby("EC").size().index,
-        y=growth_all.groupby("EC").size(),
-        row=2, col=2
-    )
-
-    fig2.update_layout(font=PLOTLY_FONT, height=700)
+    fig2 = build_ec_grid(ec_avg, leaf_mean, length_mean, ec_counts)
     st.plotly_chart(fig2, use_container_width=True)
 
     st.subheader("학교별 생중량 분포")
-    fig_box = px.box(
-        growth_all,
-        x="학교",
-        y="생중량(g)",
-        color="학교"
-    )
-    fig_box.update_layout(font=PLOTLY_FONT)
+    fig_box = build_weight_box(weight_box_stats(growth_all))
     st.plotly_chart(fig_box, use_container_width=True)
 
     st.subheader("상관관계 분석")
     c1, c2 = st.columns(2)
     with c1:
-        fig_sc1 = px.scatter(
-            growth_all,
-            x="잎 수(장)",
-            y="생중량(g)",
-            trendline="ols"
-        )
-        fig_sc1.update_layout(font=PLOTLY_FONT)
+        fig_sc1 = build_scatter(growth_all, "잎 수(장)")
         st.plotly_chart(fig_sc1, use_container_width=True)
 
     with c2:
-        fig_sc2 = px.scatter(
-            growth_all,
-            x="지상부 길이(mm)",
-            y="생중량(g)",
-            trendline="ols"
-        )
-        fig_sc2.update_layout(font=PLOTLY_FONT)
+        fig_sc2 = build_scatter(growth_all, "지상부 길이(mm)")
         st.plotly_chart(fig_sc2, use_container_width=True)
 
     with st.expander("생육 데이터 원본 / XLSX 다운로드"):
         st.dataframe(growth_all)
-        buffer = io.BytesIO()
-        growth_all.to_excel(buffer, index=False, engine="openpyxl")
-        buffer.seek(0)
         st.download_button(
             "XLSX 다운로드",
-            data=buffer,
+            data=to_xlsx_bytes(growth_all),
             file_name="생육결과_전체.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
+
+with tab1:
+    render_overview()
+
+with tab2:
+    render_environment(selected_school)
+
+with tab3:
+    render_growth()